@@ -1,6 +1,6 @@
 import os
 import yaml
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 @dataclass
 class AppConfig:
@@ -16,6 +16,17 @@ class AppConfig:
     target_audio_bitrate: int  # в кбит/с
     long_video_encoder: str
     short_video_encoder: str
+    output_container: str = "mp4"  # "mp4" или "mkv"
+    stream_mapping: dict = field(default_factory=dict)  # Правила отбора аудио, субтитров и вложений
+    input_recursive: bool = False
+    input_include: list = field(default_factory=lambda: ["*.mkv", "*.mp4", "*.avi"])
+    input_exclude: list = field(default_factory=list)
+    mirror_input_tree: bool = False
+    output_template_wm: str = "[Ani4KHUB] {base_name}_watermarked.{ext}"
+    output_template_no_wm: str = "[Ani4KHUB] {base_name}_wwm.{ext}"
+    gpu_filters: bool = False  # Использовать overlay_cuda/scale_cuda, если они доступны
+    profiling: bool = False  # Отладочный режим профилирования FFmpeg и Python
+    profiling_filter_threads: list = field(default_factory=list)  # Значения -filter_complex_threads для замера фильтров
 
     def validate(self):
         """Валидация конфигурации"""
@@ -42,6 +53,10 @@ class AppConfig:
             raise ValueError("default_video_bitrate должно быть больше 0")
         if self.target_audio_bitrate <= 0:
             raise ValueError("target_audio_bitrate должно быть больше 0")
+        if self.output_container not in {"mp4", "mkv"}:
+            raise ValueError(f"Недопустимое значение для output_container: {self.output_container}")
+        if not self.input_include:
+            raise ValueError("input_include должен содержать хотя бы один шаблон")
     
     # ДОБАВЛЕНО: Валидация значений кодеров
     def _validate_encoders(self):
@@ -7,7 +7,7 @@ class BitrateCalculator:
     def __init__(self, target_size_gb=None):
         self.target_size_gb = target_size_gb or CONFIG.max_file_size_gb
 
-    def calculate_sizes(self, duration, video_bitrate, audio_bitrate=None):
+    def calculate_sizes(self, duration, video_bitrate, audio_bitrate=None, audio_tracks=1):
         # Используем значение из конфига как максимальное
         audio_bitrate = min(
             audio_bitrate or CONFIG.target_audio_bitrate, 
@@ -15,14 +15,15 @@ class BitrateCalculator:
         )
         
         video_size = (video_bitrate * duration) / (8 * 1024 * 1024)  # бит/с → МБ
-        audio_size = (audio_bitrate * 1000 * duration) / (8 * 1024 * 1024)  # кбит/с → МБ
+        audio_size = (audio_bitrate * 1000 * duration * audio_tracks) / (8 * 1024 * 1024)  # кбит/с → МБ
         return video_size, audio_size
 
     def adjust_bitrate_to_size(
         self,
         duration: float,
         audio_bitrate: int,
-        target_size_gb: float
+        target_size_gb: float,
+        audio_tracks: int = 1
     ) -> tuple[int, int, int]:
         MIN_VIDEO_BITRATE = 1 * 10**6  # 1 Мбит/с
         target_size_bytes = target_size_gb * 1024**3
@@ -32,7 +33,8 @@ class BitrateCalculator:
             video_size, audio_size = self.calculate_sizes(
                 duration,
                 current_bitrate,
-                audio_bitrate
+                audio_bitrate,
+                audio_tracks
             )
             total_size = (video_size + audio_size) * 1024**2  # в байты
             
@@ -0,0 +1,186 @@
+# src/core/processors/filter_graph.py
+import subprocess
+from functools import lru_cache
+
+# Фильтры, необходимые для наложения водяного знака без выгрузки кадров из видеопамяти
+CUDA_FILTERS = {"hwupload_cuda", "scale_cuda", "overlay_cuda"}
+# Декодеры, которые отдают кадры в видеопамять при -hwaccel_output_format cuda
+CUDA_DECODERS = {"hevc_cuvid", "h264_cuvid"}
+# overlay_cuda работает только с 8-битными кадрами (nv12 / yuv420p),
+# а cuvid выдает такие исходники в видеопамяти как nv12
+CUDA_OVERLAY_PIX_FMTS = {"yuv420p", "yuvj420p", "nv12"}
+
+# Масштаб водяного знака относительно исходного изображения
+WATERMARK_SCALE = 0.09
+# Положение водяного знака: правый верхний угол с отступом, зависящим от его размера
+OVERLAY_X = "max(main_w - w - (w/3.5), 0)"
+OVERLAY_Y = "max((w/2.5) - (h/2), 0)"
+
+
+@lru_cache(maxsize=None)
+def probe_available_filters(ffmpeg_path: str) -> frozenset:
+    """Список фильтров, доступных в сборке FFmpeg"""
+    try:
+        result = subprocess.run(
+            [ffmpeg_path, "-hide_banner", "-filters"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+    except OSError:
+        return frozenset()
+
+    filters = set()
+    for line in result.stdout.decode(errors="replace").splitlines():
+        # Формат строки: " TSC overlay_cuda      VV->V      Overlay one video on top of another using CUDA"
+        parts = line.split()
+        if len(parts) >= 3 and "->" in parts[2]:
+            filters.add(parts[1])
+    return frozenset(filters)
+
+
+@lru_cache(maxsize=None)
+def probe_image_size(image_path: str):
+    """Размер изображения (ширина, высота) через ffprobe или None"""
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe",
+                "-v", "error",
+                "-select_streams", "v:0",
+                "-show_entries", "stream=width,height",
+                "-of", "csv=p=0",
+                image_path
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        width, height = result.stdout.decode().strip().split(",")[:2]
+        return int(width), int(height)
+    except (OSError, ValueError):
+        return None
+
+
+class FilterGraphBuilder:
+    def __init__(self, video_input: str, output_format: str, decoder: str,
+                 source_pix_fmt: str = "", available_filters: frozenset = frozenset(),
+                 main_width: int = 0, watermark_size: tuple = None,
+                 watermark_input: str = "1:v", output_label: str = "vout"):
+        """
+        Сборка filter_complex для наложения водяного знака
+        :param video_input: Спецификатор основного видеопотока (например, "0:v:0")
+        :param output_format: Формат пикселей для кодера ("p010le" / "yuv420p10le")
+        :param decoder: Декодер входного видео (_get_input_decoder)
+        :param source_pix_fmt: Формат пикселей исходника из ffprobe
+        :param available_filters: Фильтры, доступные в FFmpeg (probe_available_filters)
+        :param main_width: Ширина основного видео (для расчета положения на GPU)
+        :param watermark_size: Размер изображения водяного знака (probe_image_size)
+        :param watermark_input: Спецификатор потока с изображением водяного знака
+        :param output_label: Метка выхода графа для -map
+        """
+        self.video_input = video_input
+        self.output_format = output_format
+        self.decoder = decoder
+        self.source_pix_fmt = source_pix_fmt
+        self.available_filters = available_filters
+        self.main_width = main_width
+        self.watermark_size = watermark_size
+        self.watermark_input = watermark_input
+        self.output_label = output_label
+        self.use_cuda = self._can_use_cuda()
+
+    def _can_use_cuda(self) -> bool:
+        """Кадры остаются в видеопамяти только если поддерживаются все стадии"""
+        return (
+            CUDA_FILTERS <= set(self.available_filters)
+            and self.decoder in CUDA_DECODERS
+            and self.source_pix_fmt in CUDA_OVERLAY_PIX_FMTS
+            # Положение для overlay_cuda рассчитывается заранее
+            and bool(self.main_width)
+            and bool(self.watermark_size)
+        )
+
+    @property
+    def _scaled_watermark_size(self) -> tuple:
+        """Размер водяного знака после масштабирования (как в фильтре scale)"""
+        width, height = self.watermark_size
+        return int(width * WATERMARK_SCALE), int(height * WATERMARK_SCALE)
+
+    @property
+    def _fixed_position(self) -> tuple:
+        """
+        Положение водяного знака в пикселях для overlay_cuda.
+        Выражения x/y поддерживаются не во всех сборках overlay_cuda,
+        поэтому считаем OVERLAY_X/OVERLAY_Y заранее с тем же выравниванием
+        по четным координатам, что и overlay для yuv420p.
+        """
+        w, h = self._scaled_watermark_size
+        x = max(self.main_width - w - (w / 3.5), 0)
+        y = max((w / 2.5) - (h / 2), 0)
+        return int(x) & ~1, int(y) & ~1
+
+    @property
+    def decode_options(self) -> list:
+        """Параметры декодирования основного входного файла"""
+        options = ["-hwaccel", "cuda"]
+        if self.use_cuda:
+            # Не выгружаем кадры в системную память
+            options += ["-hwaccel_output_format", "cuda"]
+        return options + ["-c:v", self.decoder]
+
+    @property
+    def output_options(self) -> list:
+        """Параметры формата пикселей для кодера"""
+        # Для кадров в видеопамяти формат задается в графе (scale_cuda)
+        if self.use_cuda:
+            return []
+        return ["-pix_fmt", self.output_format]
+
+    def _watermark_stage(self) -> str:
+        """Масштабирование водяного знака"""
+        if self.use_cuda:
+            # Одно изображение загружается в видеопамять один раз;
+            # swscale сразу переводит RGBA в ограниченный диапазон yuva420p
+            width, height = self._scaled_watermark_size
+            stages = [f"[{self.watermark_input}]scale={width}:{height}", "format=yuva420p", "hwupload_cuda"]
+        else:
+            stages = [
+                f"[{self.watermark_input}]scale=iw*{WATERMARK_SCALE}:ih*{WATERMARK_SCALE}",
+                "zscale=rangein=full:range=limited",
+                "format=rgba",
+            ]
+        return ",".join(stages) + "[watermark]"
+
+    def _main_stage(self) -> str:
+        """Подготовка основного видео к наложению"""
+        if self.use_cuda:
+            # overlay_cuda требует одинаковый формат основного видео и водяного знака:
+            # переводим nv12 от cuvid в yuv420p, чтобы наложить yuva420p с альфа-каналом
+            return f"[{self.video_input}]scale_cuda=format=yuv420p[main]"
+        return ""
+
+    def _overlay_stage(self) -> str:
+        """Наложение водяного знака на основное видео"""
+        if self.use_cuda:
+            x, y = self._fixed_position
+            return f"[main][watermark]overlay_cuda=x={x}:y={y}[overlayed_video]"
+        return (
+            f"[{self.video_input}][watermark]overlay="
+            f"x='{OVERLAY_X}':y='{OVERLAY_Y}'[overlayed_video]"
+        )
+
+    def _format_stage(self) -> str:
+        """Приведение к формату пикселей кодера"""
+        if self.use_cuda:
+            # overlay_cuda выдает 8-битные кадры, переводим в 10 бит на GPU
+            return f"[overlayed_video]scale_cuda=format=p010le[{self.output_label}]"
+        return f"[overlayed_video]format={self.output_format}[{self.output_label}]"
+
+    def build(self) -> str:
+        """Итоговая строка для -filter_complex"""
+        stages = [
+            self._watermark_stage(),
+            self._main_stage(),
+            self._overlay_stage(),
+            self._format_stage(),
+        ]
+        return ";".join(stage for stage in stages if stage)
@@ -0,0 +1,135 @@
+# src/core/processors/stream_mapper.py
+from src.utils.logger import logger
+
+# Текстовые субтитры, которые можно сконвертировать в mov_text для MP4
+TEXT_SUBTITLE_CODECS = {"ass", "ssa", "subrip", "srt", "mov_text", "webvtt", "text"}
+# Субтитры, которые можно скопировать в MKV без изменений
+MKV_COPY_SUBTITLE_CODECS = {
+    "ass", "ssa", "subrip", "srt", "webvtt",
+    "hdmv_pgs_subtitle", "dvd_subtitle", "dvb_subtitle",
+}
+# Текстовые субтитры, которые не поддерживаются MKV и конвертируются в SRT
+MKV_SRT_SUBTITLE_CODECS = {"mov_text", "text"}
+
+
+class StreamMapper:
+    def __init__(self, streams: list, container: str, rules: dict = None):
+        """
+        Явная карта потоков для FFmpeg на основе списка потоков из ffprobe
+        :param streams: Потоки входного файла (GetVideoMetadata.streams)
+        :param container: Контейнер выходного файла ("mp4" или "mkv")
+        :param rules: Правила отбора потоков (CONFIG.stream_mapping)
+        """
+        self.streams = streams or []
+        self.container = container
+        self.rules = rules or {}
+
+        self.video_stream = None
+        self.audio_streams = []
+        self.subtitle_streams = []
+        self.attachment_streams = []
+        self._select_streams()
+
+    def _select_streams(self):
+        """Отбор потоков по правилам из конфигурации"""
+        for stream in self.streams:
+            codec_type = stream.get("codec_type")
+
+            if codec_type == "video":
+                # Обложки (attached_pic) не являются основным видеопотоком
+                if self.video_stream is None and not stream.get("disposition", {}).get("attached_pic"):
+                    self.video_stream = stream
+
+            elif codec_type == "audio":
+                if self._matches(stream, self.rules.get("audio") or {}):
+                    self.audio_streams.append(stream)
+
+            elif codec_type == "subtitle":
+                if not self._matches(stream, self.rules.get("subtitle") or {}):
+                    continue
+                if self._subtitle_codec(stream) is None:
+                    logger.warning(
+                        f"Субтитры #{stream.get('index')} ({stream.get('codec_name')}) "
+                        f"не поддерживаются в {self.container.upper()}. Пропускаем."
+                    )
+                    continue
+                self.subtitle_streams.append(stream)
+
+            elif codec_type == "attachment":
+                # Вложения (шрифты) поддерживаются только в MKV
+                if self.container == "mkv" and self.rules.get("attachments", True):
+                    self.attachment_streams.append(stream)
+
+        logger.info(
+            f"Карта потоков: аудио - {len(self.audio_streams)}, "
+            f"субтитры - {len(self.subtitle_streams)}, вложения - {len(self.attachment_streams)}"
+        )
+
+    @staticmethod
+    def _matches(stream: dict, rule: dict) -> bool:
+        """Проверка потока на соответствие правилу (пустой список - без ограничений)"""
+        language = (stream.get("tags") or {}).get("language", "und")
+        languages = rule.get("languages") or []
+        if languages and language not in languages:
+            return False
+
+        codecs = rule.get("codecs") or []
+        if codecs and stream.get("codec_name") not in codecs:
+            return False
+
+        disposition = stream.get("disposition") or {}
+        for flag in rule.get("exclude_dispositions") or []:
+            if disposition.get(flag):
+                return False
+
+        return True
+
+    def _subtitle_codec(self, stream: dict):
+        """Кодек субтитров в выходном файле (None - не поддерживаются контейнером)"""
+        codec_name = stream.get("codec_name")
+        if self.container == "mp4":
+            return "mov_text" if codec_name in TEXT_SUBTITLE_CODECS else None
+        if codec_name in MKV_COPY_SUBTITLE_CODECS:
+            return "copy"
+        if codec_name in MKV_SRT_SUBTITLE_CODECS:
+            return "srt"
+        return None
+
+    @property
+    def video_input(self) -> str:
+        """Спецификатор основного видеопотока входного файла"""
+        if self.video_stream is None:
+            return "0:v:0"
+        return f"0:{self.video_stream['index']}"
+
+    @property
+    def audio_track_count(self) -> int:
+        """Количество аудиодорожек в выходном файле"""
+        if not self.streams:
+            return 1
+        return len(self.audio_streams)
+
+    def mapping_parameters(self, video_source: str) -> list:
+        """
+        Параметры -map и кодеков для всех потоков, кроме видео-кодека
+        :param video_source: Источник видео ("[метка]" из filter_complex или спецификатор потока)
+        """
+        params = ["-map", video_source]
+
+        # Если ffprobe не вернул список потоков, используем поведение по умолчанию
+        if not self.streams:
+            return params + ["-map", "0:a?"]
+
+        output_index = 1
+        for stream in self.audio_streams + self.subtitle_streams + self.attachment_streams:
+            params += [
+                "-map", f"0:{stream['index']}",
+                # Сохраняем язык и название дорожки
+                f"-map_metadata:s:{output_index}", f"0:s:{stream['index']}",
+            ]
+            output_index += 1
+
+        for subtitle_index, stream in enumerate(self.subtitle_streams):
+            params += [f"-c:s:{subtitle_index}", self._subtitle_codec(stream)]
+
+        return params
@@ -9,16 +9,27 @@ from src.config import CONFIG
 from src.utils.logger import logger
 from src.core.calculations.bitrate_calculator import BitrateCalculator
 from src.utils.get_metadata import GetVideoMetadata
+from src.core.processors.stream_mapper import StreamMapper
+from src.core.processors.filter_graph import FilterGraphBuilder, probe_available_filters, probe_image_size
+from src.utils.profiler import JobProfiler, DECODE_PASS, FILTER_PASS
+from src.core.services.output_layout import OutputLockedError, reserve_output, source_id
 
 class VideoProcessor:
-    def __init__(self, metadata: GetVideoMetadata, bitrate_calculator: BitrateCalculator):
+    def __init__(self, metadata: GetVideoMetadata, bitrate_calculator: BitrateCalculator,
+                 profiler: JobProfiler = None):
         self.metadata = metadata
         self.bitrate_calculator = bitrate_calculator
+        self.profiler = profiler  # Режим профилирования (None - выключен)
         self.adjusted_audio_bitrate = min(
             self.metadata.audio_bitrate,
             CONFIG.target_audio_bitrate
         )
         self.current_encoder = None 
+        self.stream_mapper = StreamMapper(
+            self.metadata.streams,
+            CONFIG.output_container,
+            CONFIG.stream_mapping
+        )
         self._setup_bitrates()
 
     def _setup_bitrates(self):
@@ -33,6 +44,7 @@ class VideoProcessor:
                 duration=self.metadata.duration,
                 audio_bitrate=self.metadata.audio_bitrate,
                 target_size_gb=CONFIG.max_file_size_gb,
+                audio_tracks=self.stream_mapper.audio_track_count,
             )
             self.video_bitrate, self.maxrate, self.bufsize = calc_result
         else:
@@ -54,6 +66,7 @@ class VideoProcessor:
             # "-hide_banner",
             "-loglevel", "info",  # Включаем вывод информации
             "-stats",             # Включаем статистику
+            *(self.profiler.ffmpeg_options if self.profiler else []),
             *command         # Оставляем остальные параметры
         ]
         
@@ -89,6 +102,10 @@ class VideoProcessor:
                 # sys.stderr.write(line)
                 # sys.stderr.flush()
 
+                # Строки -benchmark передаем профилировщику
+                if self.profiler and self.profiler.parse_line(line):
+                    continue
+
                 # Парсим время из двух форматов:
                 # 1. Стандартный вывод времени
                 time_match = re.search(
@@ -131,21 +148,24 @@ class VideoProcessor:
         finally:
             progress_bar.close()
             process.terminate()
+            if self.profiler:
+                self.profiler.end_pass()
         
     def _build_watermark_command(self, input_file: str, output_path: str) -> list:
         """Сборка команды для обработки с водяным знаком"""
-        # Определяем формат пикселей в зависимости от кодера
-        pix_fmt = "p010le" if self.current_encoder == "av1_nvenc" else "yuv420p10le"
+        filter_graph = self._filter_graph
         return [
             # Входные файлы
-            "-hwaccel", "cuda",
-            "-c:v", self._get_input_decoder(),
+            *filter_graph.decode_options,
             "-i", input_file,
             "-i", CONFIG.static_watermark,
 
             # Фильтры
-            "-filter_complex", self._watermark_filter,
-            "-pix_fmt", pix_fmt,
+            "-filter_complex", filter_graph.build(),
+            *filter_graph.output_options,
+
+            # Карта потоков
+            *self.stream_mapper.mapping_parameters(f"[{filter_graph.output_label}]"),
 
             # Параметры кодирования
             *self._encoding_parameters,
@@ -162,6 +182,9 @@ class VideoProcessor:
             "-c:v", self._get_input_decoder(),
             "-i", input_file,
 
+            # Карта потоков
+            *self.stream_mapper.mapping_parameters(self.stream_mapper.video_input),
+
             # Параметры кодирования
             *self._encoding_parameters,
 
@@ -174,7 +197,6 @@ class VideoProcessor:
         """Общие параметры кодирования, зависящие от выбранного кодера."""
         # Общие параметры для аудио и контейнера
         common_params = [
-            "-movflags", "+faststart",
             "-c:a", "aac",
             "-b:a", f"{self.adjusted_audio_bitrate}k",
             "-ac", "2",
@@ -182,6 +204,8 @@ class VideoProcessor:
             "-metadata", f"description={CONFIG.description}",
             "-metadata", f"title={CONFIG.description}"
         ]
+        if CONFIG.output_container == "mp4":
+            common_params = ["-movflags", "+faststart", *common_params]
 
         if self.current_encoder == "av1_nvenc":
             # Параметры для AV1 с исправленным синтаксисом
@@ -223,33 +247,67 @@ class VideoProcessor:
                 "-temporal-aq", "1",
                 "-b_ref_mode", "each",
                 "-nonref_p", "1",
-                "-tag:v", "hvc1",
                 "-colorspace", self.metadata.color_space,
                 "-color_primaries", self.metadata.color_primaries,
                 "-color_trc", self.metadata.color_trc,
                 "-color_range", self.metadata.color_range,
             ]
+            if CONFIG.output_container == "mp4":
+                hevc_params += ["-tag:v", "hvc1"]
             return hevc_params + common_params
         
         else:
             raise ValueError(f"Неподдерживаемый кодер указан в конфигурации: {self.current_encoder}")
 
     @property
-    def _watermark_filter(self) -> str:
-        """Фильтр для добавления водяного знака"""
+    def _filter_graph(self) -> FilterGraphBuilder:
+        """Граф фильтров для добавления водяного знака"""
         # Определяем конечный формат в зависимости от кодера для лучшей производительности
         output_format = "p010le" if self.current_encoder == "av1_nvenc" else "yuv420p10le"
+        # Формат пикселей берем из того же потока, к которому применяется граф
+        video_stream = self.stream_mapper.video_stream or {}
 
-        return (
-            "[1:v]scale=iw*0.09:ih*0.09,"
-            "zscale=rangein=full:range=limited,"
-            "format=rgba[watermark];"
-            "[0:v][watermark]overlay="
-            "x='max(main_w - w - (w/3.5), 0)':"
-            "y='max((w/2.5) - (h/2), 0)'[overlayed_video];"
-            f"[overlayed_video]format={output_format}"
+        return FilterGraphBuilder(
+            video_input=self.stream_mapper.video_input,
+            output_format=output_format,
+            decoder=self._get_input_decoder(),
+            source_pix_fmt=video_stream.get("pix_fmt", self.metadata.pix_fmt),
+            available_filters=probe_available_filters(CONFIG.ffmpeg_path) if CONFIG.gpu_filters else frozenset(),
+            main_width=video_stream.get("width", 0),
+            watermark_size=probe_image_size(CONFIG.static_watermark) if CONFIG.gpu_filters else None,
         )
 
+    def _profile_filter_cost(self, input_file: str):
+        """Проходы без кодирования для прямого замера стоимости фильтров"""
+        filter_graph = self._filter_graph
+        null_output = ["-f", "null", "-"]
+
+        logger.info("Профилирование: проход только декодирования")
+        self.profiler.start_pass(DECODE_PASS)
+        self._run_ffmpeg_with_progress([
+            *filter_graph.decode_options,
+            "-i", input_file,
+            "-map", self.stream_mapper.video_input,
+            *null_output
+        ], self.metadata.duration)
+
+        # Пустой список - один проход с числом потоков по умолчанию
+        for threads in CONFIG.profiling_filter_threads or [None]:
+            threads_options = ["-filter_complex_threads", str(threads)] if threads else []
+            pass_name = f"{FILTER_PASS} threads={threads}" if threads else FILTER_PASS
+
+            logger.info(f"Профилирование: проход декодирования и фильтров ({pass_name})")
+            self.profiler.start_pass(pass_name)
+            self._run_ffmpeg_with_progress([
+                *filter_graph.decode_options,
+                "-i", input_file,
+                "-i", CONFIG.static_watermark,
+                *threads_options,
+                "-filter_complex", filter_graph.build(),
+                "-map", f"[{filter_graph.output_label}]",
+                *null_output
+            ], self.metadata.duration)
+
     def _get_input_decoder(self) -> str:
         """Определение декодера для входного видео"""
         codec = self.metadata.codec.lower()
@@ -266,9 +324,22 @@ class VideoProcessor:
             return
 
         logger.info(f"Начало обработки с водяным знаком: {os.path.basename(input_file)}")
-        command = self._build_watermark_command(input_file, output_path)
-        logger.debug(f"Команда FFmpeg: {' '.join(command)}")
-        self._run_ffmpeg_with_progress(command, self.metadata.duration)
+        logger.info(
+            "Наложение водяного знака: "
+            + ("в видеопамяти (overlay_cuda)" if self._filter_graph.use_cuda else "в системной памяти (overlay)")
+        )
+        if self.profiler:
+            self._profile_filter_cost(input_file)
+
+        try:
+            with reserve_output(output_path, source_id(input_file, CONFIG.input_dir)) as part_path:
+                command = self._build_watermark_command(input_file, part_path)
+                logger.debug(f"Команда FFmpeg: {' '.join(command)}")
+                if self.profiler:
+                    self.profiler.start_pass("watermark")
+                self._run_ffmpeg_with_progress(command, self.metadata.duration)
+        except OutputLockedError as e:
+            logger.warning(f"{e}. Пропускаем.")
 
     def process_without_watermark(self, input_file: str, output_path: str):
         """Обработка видео без водяного знака"""
@@ -277,6 +348,12 @@ class VideoProcessor:
             return
 
         logger.info(f"Начало обработки без водяного знака: {os.path.basename(input_file)}")
-        command = self._build_base_command(input_file, output_path)
-        logger.debug(f"Команда FFmpeg: {' '.join(command)}")
-        self._run_ffmpeg_with_progress(command, self.metadata.duration)
\ No newline at end of file
+        try:
+            with reserve_output(output_path, source_id(input_file, CONFIG.input_dir)) as part_path:
+                command = self._build_base_command(input_file, part_path)
+                logger.debug(f"Команда FFmpeg: {' '.join(command)}")
+                if self.profiler:
+                    self.profiler.start_pass("no_watermark")
+                self._run_ffmpeg_with_progress(command, self.metadata.duration)
+        except OutputLockedError as e:
+            logger.warning(f"{e}. Пропускаем.")
\ No newline at end of file
@@ -0,0 +1,208 @@
+# src/core/services/output_layout.py
+import os
+import fnmatch
+import hashlib
+from contextlib import contextmanager
+
+from src.utils.logger import logger
+
+
+class OutputLockedError(FileExistsError):
+    """Выходной файл уже записывается или создан другим процессом"""
+
+
+# Папка с записями о том, из какого исходника создан каждый выходной файл
+OWNERS_DIR = ".sources"
+
+
+def source_id(input_file: str, input_dir: str) -> str:
+    """Идентификатор исходника: путь относительно input_dir"""
+    return os.path.relpath(input_file, input_dir).replace(os.sep, "/")
+
+
+def _owner_path(output_path: str) -> str:
+    """Путь записи о владельце выходного файла"""
+    return os.path.join(os.path.dirname(output_path), OWNERS_DIR, os.path.basename(output_path) + ".source")
+
+
+def read_owner(output_path: str):
+    """Исходник, которому принадлежит выходной файл (None - запись отсутствует)"""
+    try:
+        with open(_owner_path(output_path), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def write_owner(output_path: str, source: str):
+    """Запись о владельце выходного файла"""
+    owner_path = _owner_path(output_path)
+    os.makedirs(os.path.dirname(owner_path), exist_ok=True)
+    with open(owner_path, "w", encoding="utf-8") as f:
+        f.write(source)
+
+
+def partial_path(output_path: str) -> str:
+    """Временный файл, в который FFmpeg пишет до успешного завершения"""
+    root, ext = os.path.splitext(output_path)
+    # Расширение сохраняем, чтобы FFmpeg выбрал нужный контейнер
+    return f"{root}.part{ext}"
+
+
+@contextmanager
+def reserve_output(output_path: str, source: str = None):
+    """
+    Атомарное резервирование выходного файла на диске.
+    Создает <имя>.part<расширение> через O_CREAT | O_EXCL: два процесса
+    не могут зарезервировать один путь. При успехе временный файл
+    переименовывается в итоговый, при ошибке - удаляется.
+    :param output_path: Итоговый путь выходного файла
+    :param source: Идентификатор исходника (source_id) для записи о владельце
+    :return: Путь временного файла для записи FFmpeg
+    """
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    part_path = partial_path(output_path)
+    try:
+        fd = os.open(part_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        raise OutputLockedError(
+            f"Файл {output_path} уже записывается другим процессом. "
+            f"Если это не так, удалите {part_path}"
+        )
+    os.close(fd)
+
+    try:
+        # Другой процесс мог завершить запись между проверкой и резервированием
+        if os.path.exists(output_path):
+            raise OutputLockedError(f"Файл {output_path} уже создан другим процессом")
+        if source is not None:
+            owner = read_owner(output_path)
+            if owner not in (None, source):
+                raise OutputLockedError(f"Путь {output_path} уже занят исходником {owner}")
+            write_owner(output_path, source)
+        yield part_path
+        os.replace(part_path, output_path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+
+def _matches_any(rel_path: str, patterns: list) -> bool:
+    """Проверка относительного пути и имени файла на соответствие glob-шаблонам"""
+    rel_path = rel_path.replace(os.sep, "/").lower()
+    name = os.path.basename(rel_path)
+    return any(
+        fnmatch.fnmatch(rel_path, pattern.lower()) or fnmatch.fnmatch(name, pattern.lower())
+        for pattern in patterns
+    )
+
+
+def discover_input_files(input_dir: str, include: list, exclude: list,
+                         recursive: bool = True, skip_dirs: list = None) -> list:
+    """
+    Поиск входных видеофайлов
+    :param input_dir: Корневая директория с исходниками
+    :param include: Шаблоны включаемых файлов (например, "*.mkv")
+    :param exclude: Шаблоны исключаемых файлов и папок (например, "*/Extras/*")
+    :param recursive: Обходить вложенные папки
+    :param skip_dirs: Директории, которые не нужно обходить (папки вывода, папка скрипта)
+    :return: Отсортированный список абсолютных путей
+    """
+    skip_dirs = {os.path.normcase(os.path.abspath(d)) for d in (skip_dirs or [])}
+    found = []
+
+    for root, dirs, files in os.walk(input_dir):
+        # Не заходим в папки вывода, чтобы не кодировать результаты повторно
+        dirs[:] = sorted(
+            d for d in dirs
+            if os.path.normcase(os.path.abspath(os.path.join(root, d))) not in skip_dirs
+        )
+        if not recursive:
+            dirs[:] = []
+
+        for file in files:
+            file_path = os.path.join(root, file)
+            rel_path = os.path.relpath(file_path, input_dir)
+            if not _matches_any(rel_path, include):
+                continue
+            if exclude and _matches_any(rel_path, exclude):
+                continue
+            found.append(file_path)
+
+    return sorted(found)
+
+
+class OutputLayout:
+    def __init__(self, input_dir: str, mirror_tree: bool = False):
+        """
+        Формирование путей выходных файлов по шаблонам
+        :param input_dir: Корневая директория с исходниками
+        :param mirror_tree: Повторять структуру папок исходников в папке вывода
+        """
+        self.input_dir = input_dir
+        self.mirror_tree = mirror_tree
+
+    def template_fields(self, input_file: str, **extra) -> dict:
+        """Поля, доступные в шаблоне имени выходного файла"""
+        rel_path = os.path.relpath(input_file, self.input_dir)
+        rel_dir = os.path.dirname(rel_path)
+        base_name, source_ext = os.path.splitext(os.path.basename(input_file))
+        return {
+            "base_name": base_name,
+            "source_ext": source_ext.lstrip("."),
+            "rel_dir": rel_dir,
+            "parent": os.path.basename(os.path.dirname(os.path.abspath(input_file))),
+            **extra,
+        }
+
+    def resolve(self, template: str, output_dir: str, input_file: str, **extra) -> str:
+        """
+        Построение пути выходного файла с учетом владельцев уже занятых путей
+        :param template: Шаблон имени (например, "[Ani4KHUB] {base_name}_wwm.{ext}")
+        :param output_dir: Папка вывода
+        :param input_file: Входной файл
+        :param extra: Дополнительные поля шаблона (ext, codec, encoder, ...)
+        """
+        fields = self.template_fields(input_file, **extra)
+        try:
+            file_name = template.format_map(fields)
+        except KeyError as e:
+            raise ValueError(f"Неизвестное поле {e} в шаблоне имени: {template}")
+
+        target_dir = os.path.join(output_dir, fields["rel_dir"]) if self.mirror_tree else output_dir
+        output_path = os.path.normpath(os.path.join(target_dir, file_name))
+        return self._disambiguate(output_path, source_id(input_file, self.input_dir), fields)
+
+    @staticmethod
+    def _source_tags(source: str, fields: dict) -> list:
+        """Суффиксы для различения исходников: папка, расширение, хеш пути"""
+        tags = []
+        if fields["rel_dir"]:
+            tags.append(fields["rel_dir"].replace(os.sep, "_").replace("/", "_"))
+        if fields["source_ext"]:
+            tags.append(fields["source_ext"])
+        tags.append(hashlib.sha1(source.encode("utf-8")).hexdigest()[:8])
+        return list(dict.fromkeys(tags))
+
+    def _disambiguate(self, output_path: str, source: str, fields: dict) -> str:
+        """
+        Выбор пути, не принадлежащего другому исходнику.
+        Суффикс зависит только от самого исходника, а не от порядка обработки,
+        поэтому при повторных запусках каждый исходник получает тот же путь.
+        """
+        root, ext = os.path.splitext(output_path)
+        candidates = [output_path] + [f"{root} [{tag}]{ext}" for tag in self._source_tags(source, fields)]
+
+        for candidate in candidates:
+            owner = read_owner(candidate)
+            if owner is None and os.path.exists(candidate):
+                # Файл создан до появления записей о владельцах: закрепляем его за первым исходником
+                write_owner(candidate, source)
+                owner = source
+            if owner in (None, source):
+                if candidate != output_path:
+                    logger.warning(f"Путь {output_path} занят другим исходником. Используется {candidate}")
+                return candidate
+
+        # Хеш пути исходника совпадает только для того же исходника
+        return candidates[-1]
@@ -1,17 +1,20 @@
 import subprocess
 import os
+import json
 from colorama import Fore
 
 class GetVideoMetadata:
     def __init__(self, input_file):
         self.input_file = input_file
         self.codec = None
+        self.pix_fmt = ''
         self.duration = 0.0
         self.audio_bitrate = 0.0
         self.color_space = 'bt709'
         self.color_primaries = 'bt709'
         self.color_trc = 'bt709'
         self.color_range = 'tv'
+        self.streams = []
         self.is_valid = False
         self.extract()
 
@@ -62,6 +65,17 @@ class GetVideoMetadata:
                 "-show_entries", "stream=color_range"
             ).strip() or 'tv'
 
+            # Извлечение списка всех потоков (видео, аудио, субтитры, вложения)
+            self.streams = self._probe_streams()
+
+            # Формат пикселей (8/10 бит) основного видеопотока (обложки attached_pic пропускаем)
+            video_streams = [
+                s for s in self.streams
+                if s.get("codec_type") == "video" and not (s.get("disposition") or {}).get("attached_pic")
+            ]
+            if video_streams:
+                self.pix_fmt = video_streams[0].get("pix_fmt", '')
+
             self.is_valid = True
         except Exception as e:
             print(f"{Fore.RED}Ошибка извлечения метаданных: {str(e)}{Fore.RESET}")
@@ -81,8 +95,28 @@ class GetVideoMetadata:
         )
         return result.stdout.decode().strip()
 
+    def _probe_streams(self) -> list:
+        """Получение списка потоков файла в формате JSON"""
+        command = [
+            "ffprobe",
+            "-v", "error",
+            "-of", "json",
+            "-show_entries",
+            "stream=index,codec_type,codec_name,pix_fmt,width:stream_tags=language,title,filename,mimetype:stream_disposition",
+            self.input_file
+        ]
+        result = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        try:
+            return json.loads(result.stdout.decode() or "{}").get("streams", [])
+        except json.JSONDecodeError:
+            return []
+
     def __repr__(self):
-        return (f"VideoMetadata(codec={self.codec}, duration={self.duration}s, "
+        return (f"VideoMetadata(codec={self.codec}, pix_fmt={self.pix_fmt}, duration={self.duration}s, "
                 f"audio_bitrate={self.audio_bitrate}kbit/s, color_space={self.color_space}, "
                 f"color_primaries={self.color_primaries}, color_trc={self.color_trc}, "
-                f"color_range={self.color_range})")
\ No newline at end of file
+                f"color_range={self.color_range}, streams={len(self.streams)})")
\ No newline at end of file
@@ -0,0 +1,179 @@
+# src/utils/profiler.py
+import cProfile
+import io
+import pstats
+import re
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from src.utils.logger import logger
+
+# Строки FFmpeg с -benchmark_all: "bench:   1234 user     56 sys   1300 real encode_video 0.0"
+BENCH_STAGE_PATTERN = re.compile(r"bench:\s*(\d+) user\s+(\d+) sys\s+(\d+) real (.+?)\s*$")
+# Итоговая строка -benchmark: "bench: utime=12.345s stime=1.234s rtime=20.000s"
+BENCH_TOTAL_PATTERN = re.compile(r"bench: utime=([\d.]+)s stime=([\d.]+)s rtime=([\d.]+)s")
+BENCH_MAXRSS_PATTERN = re.compile(r"bench: maxrss=(\d+\s*\w+)")
+
+# Проходы без кодирования (-f null) для прямого замера стоимости фильтров
+DECODE_PASS = "decode_only"
+FILTER_PASS = "decode_filter"
+
+
+class JobProfiler:
+    def __init__(self, job_name: str, output_dir: str = "profiles"):
+        """
+        Профилирование одного задания: cProfile для Python и -benchmark для FFmpeg
+        :param job_name: Имя задания (обычно имя входного файла)
+        :param output_dir: Папка для отчетов профилирования
+        """
+        self.job_name = job_name
+        self.output_dir = Path(output_dir)
+        self.passes = []
+        self._profile = cProfile.Profile()
+        self._started_at = None
+
+    def __enter__(self):
+        self._started_at = time.perf_counter()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._profile.disable()
+        try:
+            self.write_report()
+        except OSError as e:
+            logger.error(f"Не удалось сохранить отчет профилирования: {e}")
+        return False
+
+    @property
+    def ffmpeg_options(self) -> list:
+        """Глобальные параметры FFmpeg для замера времени по стадиям"""
+        return ["-benchmark", "-benchmark_all"]
+
+    def start_pass(self, name: str):
+        """Начало нового прохода FFmpeg (с водяным знаком / без)"""
+        self.passes.append({
+            "name": name,
+            "stages": defaultdict(lambda: {"user": 0, "sys": 0, "real": 0, "count": 0}),
+            "total": None,
+            "maxrss": None,
+            "started_at": time.perf_counter(),
+            "wall": None,
+        })
+
+    def end_pass(self):
+        """Завершение текущего прохода FFmpeg"""
+        if self.passes:
+            current = self.passes[-1]
+            current["wall"] = time.perf_counter() - current["started_at"]
+
+    def parse_line(self, line: str) -> bool:
+        """
+        Разбор строки вывода FFmpeg
+        :return: True, если строка относится к -benchmark и не требует дальнейшей обработки
+        """
+        if not line.startswith("bench:"):
+            return False
+        if not self.passes:
+            self.start_pass("ffmpeg")
+        current = self.passes[-1]
+
+        stage_match = BENCH_STAGE_PATTERN.match(line)
+        if stage_match:
+            user, sys_time, real = map(int, stage_match.group(1, 2, 3))
+            stage = current["stages"][stage_match.group(4)]
+            stage["user"] += user
+            stage["sys"] += sys_time
+            stage["real"] += real
+            stage["count"] += 1
+            return True
+
+        total_match = BENCH_TOTAL_PATTERN.match(line)
+        if total_match:
+            current["total"] = tuple(map(float, total_match.groups()))
+            return True
+
+        maxrss_match = BENCH_MAXRSS_PATTERN.match(line)
+        if maxrss_match:
+            current["maxrss"] = maxrss_match.group(1)
+        return True
+
+    def _format_ffmpeg_pass(self, ffmpeg_pass: dict) -> list:
+        """Текстовый отчет по одному проходу FFmpeg"""
+        lines = [f"--- Проход FFmpeg: {ffmpeg_pass['name']} ---"]
+        if ffmpeg_pass["wall"] is not None:
+            lines.append(f"Время прохода: {ffmpeg_pass['wall']:.2f} s")
+        if ffmpeg_pass["total"]:
+            utime, stime, rtime = ffmpeg_pass["total"]
+            lines.append(f"FFmpeg: utime={utime:.2f}s stime={stime:.2f}s rtime={rtime:.2f}s")
+        if ffmpeg_pass["maxrss"]:
+            lines.append(f"FFmpeg maxrss: {ffmpeg_pass['maxrss']}")
+
+        stages = sorted(ffmpeg_pass["stages"].items(), key=lambda item: item[1]["real"], reverse=True)
+        if stages:
+            lines.append(f"{'Стадия':<32}{'Вызовов':>10}{'real, s':>12}{'user, s':>12}{'sys, s':>12}")
+            for name, stage in stages:
+                lines.append(
+                    f"{name:<32}{stage['count']:>10}{stage['real'] / 1e6:>12.2f}"
+                    f"{stage['user'] / 1e6:>12.2f}{stage['sys'] / 1e6:>12.2f}"
+                )
+            # Стадии выполняются в разных потоках и пересекаются по времени,
+            # поэтому остаток не является временем фильтров (см. _format_filter_cost)
+            if ffmpeg_pass["total"]:
+                staged = sum(stage["real"] for _, stage in stages) / 1e6
+                lines.append(f"{'не распределено (rtime - стадии)':<32}{'':>10}{ffmpeg_pass['total'][2] - staged:>12.2f}")
+        return lines
+
+    @staticmethod
+    def _pass_rtime(ffmpeg_pass: dict):
+        """Реальное время прохода по данным -benchmark (или по часам Python)"""
+        if ffmpeg_pass["total"]:
+            return ffmpeg_pass["total"][2]
+        return ffmpeg_pass["wall"]
+
+    def _format_filter_cost(self) -> list:
+        """Стоимость фильтров: проход декодирование+фильтры минус проход только декодирования"""
+        decode_pass = next((p for p in self.passes if p["name"] == DECODE_PASS), None)
+        filter_passes = [p for p in self.passes if p["name"].startswith(FILTER_PASS)]
+        if decode_pass is None or not filter_passes:
+            return []
+
+        decode_rtime = self._pass_rtime(decode_pass)
+        if decode_rtime is None:
+            return []
+
+        lines = ["--- Стоимость фильтров (проходы в -f null) ---", f"{DECODE_PASS}: {decode_rtime:.2f} s"]
+        for filter_pass in filter_passes:
+            rtime = self._pass_rtime(filter_pass)
+            if rtime is not None:
+                lines.append(f"{filter_pass['name']}: {rtime:.2f} s, фильтры: {rtime - decode_rtime:.2f} s")
+        return lines
+
+    def write_report(self) -> Path:
+        """Сохранение отчета: текстовая сводка и бинарный .prof для snakeviz/pstats"""
+        self.output_dir.mkdir(exist_ok=True)
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        base_path = self.output_dir / f"{timestamp}_{self.job_name}"
+
+        stats_stream = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=stats_stream)
+        stats.sort_stats("cumulative").print_stats(40)
+
+        report = [f"=== Профиль задания: {self.job_name} ==="]
+        if self._started_at is not None:
+            report.append(f"Общее время: {time.perf_counter() - self._started_at:.2f} s")
+        for ffmpeg_pass in self.passes:
+            report += [""] + self._format_ffmpeg_pass(ffmpeg_pass)
+        filter_cost = self._format_filter_cost()
+        if filter_cost:
+            report += [""] + filter_cost
+        report += ["", "--- Python (cProfile) ---", stats_stream.getvalue()]
+
+        report_path = base_path.with_name(base_path.name + ".txt")
+        report_path.write_text("\n".join(report), encoding="utf-8")
+        stats.dump_stats(str(base_path.with_name(base_path.name + ".prof")))
+
+        logger.info(f"Отчет профилирования сохранен: {report_path}")
+        return report_path
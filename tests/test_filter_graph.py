@@ -0,0 +1,137 @@
+# tests/test_filter_graph.py
+import unittest
+from unittest import mock
+
+from src.core.processors import filter_graph
+from src.core.processors.filter_graph import (
+    CUDA_FILTERS, FilterGraphBuilder, probe_available_filters, probe_image_size
+)
+
+WATERMARK_CPU = "[1:v]scale=iw*0.09:ih*0.09,zscale=rangein=full:range=limited,format=rgba[watermark]"
+OVERLAY_POSITION = "x='max(main_w - w - (w/3.5), 0)':y='max((w/2.5) - (h/2), 0)'"
+
+CPU_GRAPH = (
+    f"{WATERMARK_CPU};"
+    f"[0:0][watermark]overlay={OVERLAY_POSITION}[overlayed_video];"
+    "[overlayed_video]format=p010le[vout]"
+)
+CPU_DECODE_OPTIONS = ["-hwaccel", "cuda", "-c:v", "h264_cuvid"]
+CPU_OUTPUT_OPTIONS = ["-pix_fmt", "p010le"]
+
+FFMPEG_FILTERS_OUTPUT = b"""Filters:
+  T.. = Timeline support
+  .S. = Slice threading
+  ..C = Command support
+  A = Audio input/output
+  V = Video input/output
+  N = Dynamic number and/or type of input/output
+  | = Source or sink filter
+ TSC overlay           VV->V      Overlay a video source on top of the input.
+ ... overlay_cuda      VV->V      Overlay one video on top of another using CUDA
+ ... scale_cuda        V->V       GPU accelerated video resizer
+ ... hwupload_cuda     V->V       Upload a system memory frame to a CUDA device.
+ ... nullsrc           |->V       Null video source, return unprocessed video frames.
+"""
+
+
+class FilterGraphBuilderTest(unittest.TestCase):
+    def _builder(self, decoder="h264_cuvid", source_pix_fmt="yuv420p", available_filters=frozenset(CUDA_FILTERS),
+                 main_width=1920, watermark_size=(1000, 500)):
+        return FilterGraphBuilder(
+            video_input="0:0",
+            output_format="p010le",
+            decoder=decoder,
+            source_pix_fmt=source_pix_fmt,
+            available_filters=available_filters,
+            main_width=main_width,
+            watermark_size=watermark_size,
+        )
+
+    def assert_cpu_fallback(self, builder, decoder="h264_cuvid"):
+        self.assertFalse(builder.use_cuda)
+        self.assertEqual(builder.build(), CPU_GRAPH)
+        self.assertEqual(builder.decode_options, ["-hwaccel", "cuda", "-c:v", decoder])
+        self.assertEqual(builder.output_options, CPU_OUTPUT_OPTIONS)
+
+    def test_cuda_graph(self):
+        builder = self._builder()
+        self.assertTrue(builder.use_cuda)
+        self.assertEqual(
+            builder.build(),
+            "[1:v]scale=90:45,format=yuva420p,hwupload_cuda[watermark];"
+            "[0:0]scale_cuda=format=yuv420p[main];"
+            # x = 1920 - 90 - 90/3.5 = 1804.3, y = 90/2.5 - 45/2 = 13.5 -> четные координаты
+            "[main][watermark]overlay_cuda=x=1804:y=12[overlayed_video];"
+            "[overlayed_video]scale_cuda=format=p010le[vout]"
+        )
+        self.assertEqual(
+            builder.decode_options,
+            ["-hwaccel", "cuda", "-hwaccel_output_format", "cuda", "-c:v", "h264_cuvid"]
+        )
+        self.assertEqual(builder.output_options, [])
+
+    def test_cpu_fallback_without_cuda_filter(self):
+        for missing in sorted(CUDA_FILTERS):
+            with self.subTest(missing=missing):
+                builder = self._builder(available_filters=frozenset(CUDA_FILTERS - {missing}))
+                self.assert_cpu_fallback(builder)
+
+    def test_cpu_fallback_for_non_cuvid_decoder(self):
+        self.assert_cpu_fallback(self._builder(decoder="auto"), decoder="auto")
+
+    def test_cpu_fallback_for_10bit_source(self):
+        self.assert_cpu_fallback(self._builder(source_pix_fmt="yuv420p10le"))
+
+    def test_cpu_fallback_without_sizes(self):
+        self.assert_cpu_fallback(self._builder(main_width=0))
+        self.assert_cpu_fallback(self._builder(watermark_size=None))
+
+    def test_cuda_position_is_clamped(self):
+        builder = self._builder(main_width=64)
+        self.assertIn("overlay_cuda=x=0:y=12", builder.build())
+
+
+class ProbeAvailableFiltersTest(unittest.TestCase):
+    def setUp(self):
+        probe_available_filters.cache_clear()
+
+    def tearDown(self):
+        probe_available_filters.cache_clear()
+
+    def test_parses_filter_names(self):
+        result = mock.Mock(stdout=FFMPEG_FILTERS_OUTPUT)
+        with mock.patch.object(filter_graph.subprocess, "run", return_value=result) as run:
+            filters = probe_available_filters("ffmpeg")
+
+        run.assert_called_once()
+        self.assertEqual(run.call_args[0][0], ["ffmpeg", "-hide_banner", "-filters"])
+        self.assertEqual(
+            filters,
+            frozenset({"overlay", "overlay_cuda", "scale_cuda", "hwupload_cuda", "nullsrc"})
+        )
+
+    def test_missing_ffmpeg(self):
+        with mock.patch.object(filter_graph.subprocess, "run", side_effect=FileNotFoundError):
+            self.assertEqual(probe_available_filters("missing-ffmpeg"), frozenset())
+
+
+class ProbeImageSizeTest(unittest.TestCase):
+    def setUp(self):
+        probe_image_size.cache_clear()
+
+    def tearDown(self):
+        probe_image_size.cache_clear()
+
+    def test_parses_size(self):
+        result = mock.Mock(stdout=b"1000,500\n")
+        with mock.patch.object(filter_graph.subprocess, "run", return_value=result):
+            self.assertEqual(probe_image_size("watermark.png"), (1000, 500))
+
+    def test_unreadable_image(self):
+        result = mock.Mock(stdout=b"")
+        with mock.patch.object(filter_graph.subprocess, "run", return_value=result):
+            self.assertIsNone(probe_image_size("missing.png"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+# tests/test_output_layout.py
+import os
+import tempfile
+import unittest
+
+from src.core.services.output_layout import (
+    OutputLayout, OutputLockedError, partial_path, read_owner, reserve_output, source_id
+)
+
+TEMPLATE = "{base_name}_watermarked.{ext}"
+
+
+class ReserveOutputTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.output_path = os.path.join(self._tmp.name, "Season 1", "01_watermarked.mp4")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_renames_on_success(self):
+        with reserve_output(self.output_path) as part_path:
+            self.assertEqual(part_path, partial_path(self.output_path))
+            self.assertTrue(part_path.endswith("01_watermarked.part.mp4"))
+            with open(part_path, "w") as f:
+                f.write("video")
+
+        self.assertFalse(os.path.exists(part_path))
+        with open(self.output_path) as f:
+            self.assertEqual(f.read(), "video")
+
+    def test_releases_on_failure(self):
+        with self.assertRaises(RuntimeError):
+            with reserve_output(self.output_path) as part_path:
+                raise RuntimeError("ffmpeg failed")
+
+        self.assertFalse(os.path.exists(part_path))
+        self.assertFalse(os.path.exists(self.output_path))
+
+    def test_second_reservation_is_rejected(self):
+        with reserve_output(self.output_path):
+            with self.assertRaises(OutputLockedError):
+                with reserve_output(self.output_path):
+                    self.fail("Путь зарезервирован дважды")
+
+    def test_output_created_by_another_process(self):
+        os.makedirs(os.path.dirname(self.output_path))
+        open(self.output_path, "w").close()
+
+        with self.assertRaises(OutputLockedError):
+            with reserve_output(self.output_path):
+                self.fail("Существующий файл перезаписан")
+        self.assertFalse(os.path.exists(partial_path(self.output_path)))
+
+    def test_rejects_path_owned_by_another_source(self):
+        with reserve_output(self.output_path, "S2/01.mkv"):
+            pass
+        os.remove(self.output_path)
+
+        with self.assertRaises(OutputLockedError):
+            with reserve_output(self.output_path, "S1/01.mkv"):
+                self.fail("Путь другого исходника перезаписан")
+
+
+class OutputLayoutTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.input_dir = os.path.join(self._tmp.name, "input")
+        self.output_dir = os.path.join(self._tmp.name, "output")
+        self.layout = OutputLayout(self.input_dir, mirror_tree=False)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _source(self, rel_path: str) -> str:
+        return os.path.join(self.input_dir, *rel_path.split("/"))
+
+    def _encode(self, rel_path: str) -> str:
+        """Разрешение пути и запись файла, как при обработке одного исходника"""
+        input_file = self._source(rel_path)
+        output_path = self.layout.resolve(TEMPLATE, self.output_dir, input_file, ext="mp4")
+        if not os.path.exists(output_path):
+            with reserve_output(output_path, source_id(input_file, self.input_dir)) as part_path:
+                open(part_path, "w").close()
+        return output_path
+
+    def _output(self, name: str) -> str:
+        return os.path.join(self.output_dir, name)
+
+    def test_suffix_does_not_depend_on_run_order(self):
+        # Первый запуск: в библиотеке только второй сезон
+        self.assertEqual(self._encode("S2/01.mkv"), self._output("01_watermarked.mp4"))
+
+        # Второй запуск: добавлен первый сезон, он идет раньше при сортировке
+        self.assertEqual(self._encode("S1/01.mkv"), self._output("01_watermarked [S1].mp4"))
+        self.assertEqual(self._encode("S2/01.mkv"), self._output("01_watermarked.mp4"))
+
+        self.assertEqual(read_owner(self._output("01_watermarked.mp4")), "S2/01.mkv")
+        self.assertEqual(read_owner(self._output("01_watermarked [S1].mp4")), "S1/01.mkv")
+
+    def test_same_folder_sources_use_extension(self):
+        self.assertEqual(self._encode("01.mkv"), self._output("01_watermarked.mp4"))
+        self.assertEqual(self._encode("01.mp4"), self._output("01_watermarked [mp4].mp4"))
+
+    def test_legacy_output_is_adopted_by_first_source(self):
+        os.makedirs(self.output_dir)
+        open(self._output("01_watermarked.mp4"), "w").close()
+
+        self.assertEqual(self._encode("S2/01.mkv"), self._output("01_watermarked.mp4"))
+        self.assertEqual(self._encode("S1/01.mkv"), self._output("01_watermarked [S1].mp4"))
+
+
+if __name__ == "__main__":
+    unittest.main()
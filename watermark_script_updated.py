@@ -1,5 +1,6 @@
 import os
 import time
+from contextlib import nullcontext
 from colorama import init
 
 from src.config import CONFIG
@@ -8,24 +9,40 @@ from src.core.calculations.bitrate_calculator import BitrateCalculator
 from src.utils.get_metadata import GetVideoMetadata
 from src.core.processors.video_processor import VideoProcessor
 from src.utils.cli.cli import CLIInterface
+from src.core.services.output_layout import OutputLayout, discover_input_files
+from src.utils.profiler import JobProfiler
 
 init(autoreset=True)
 
 cli = CLIInterface()
+layout = OutputLayout(CONFIG.input_dir, mirror_tree=CONFIG.mirror_input_tree)
 
-def process_video(input_file: str, base_name: str, mode: int):
+def process_video(input_file: str, mode: int):
+    profiler = JobProfiler(os.path.basename(input_file)) if CONFIG.profiling else None
+    with profiler or nullcontext():
+        _process_video(input_file, mode, profiler)
+
+def _process_video(input_file: str, mode: int, profiler: JobProfiler = None):
     metadata = GetVideoMetadata(input_file)
     if not metadata.codec:
         logger.error(f'Не удалось получить метаданные для {input_file}')
         return
 
     cli.print_process_header(os.path.basename(input_file))
-    processor = VideoProcessor(metadata, BitrateCalculator())
-
-    output_wm = os.path.join(CONFIG.output_dir, f'[Ani4KHUB] {base_name}_watermarked.mp4')
-    output_no_wm = os.path.join(CONFIG.no_wm_output_dir, f'[Ani4KHUB] {base_name}_wwm.mp4')
+    processor = VideoProcessor(metadata, BitrateCalculator(), profiler=profiler)
 
     try:
+        fields = {
+            'ext': CONFIG.output_container,
+            'codec': metadata.codec,
+            'encoder': processor.current_encoder,
+            'duration_min': int(metadata.duration // 60),
+        }
+        if mode in (1, 2):
+            output_wm = layout.resolve(CONFIG.output_template_wm, CONFIG.output_dir, input_file, **fields)
+        if mode in (1, 3):
+            output_no_wm = layout.resolve(CONFIG.output_template_no_wm, CONFIG.no_wm_output_dir, input_file, **fields)
+
         if mode == 1:
             processor.process_with_watermark(input_file, output_wm)
             processor.process_without_watermark(input_file, output_no_wm)
@@ -66,12 +83,17 @@ def main():
 
     processed_any = False
 
-    for file in os.listdir(CONFIG.input_dir):
-        file_path = os.path.join(CONFIG.input_dir, file)
-        if os.path.isfile(file_path) and file.lower().endswith(('mkv', 'mp4', 'avi')):
-            base_name = os.path.splitext(file)[0]
-            process_video(file_path, base_name, mode)
-            processed_any = True
+    input_files = discover_input_files(
+        CONFIG.input_dir,
+        include=CONFIG.input_include,
+        exclude=CONFIG.input_exclude,
+        recursive=CONFIG.input_recursive,
+        skip_dirs=[CONFIG.output_dir, CONFIG.no_wm_output_dir, os.path.dirname(os.path.abspath(__file__))]
+    )
+
+    for file_path in input_files:
+        process_video(file_path, mode)
+        processed_any = True
 
     if not processed_any:
         logger.info("Не найдено файлов для обработки.")